@@ -0,0 +1,180 @@
+import sys
+import json
+import argparse
+import numpy as np
+import util
+from util import ParseError, parse_file, parse_fms_info, alliance_color
+from zebra_motionworks import ZebraMotionWorks, ZMWError
+
+# Zebra MotionWorks tracks are in feet, the robot log is in inches
+ZMW_SCALE = 12.0
+
+class AlignmentError(Exception):
+    def __init__(self, message):
+        self.message = message
+
+class DriftStats:
+    def __init__(self, team_key, offset, times, errors, station=None):
+        self.team_key = team_key
+        # driver station the team was picked from, None if the team was given explicitly
+        self.station = station
+        # add this to a robot log time to get the matching Zebra MotionWorks time
+        self.offset = offset
+        # errors are sampled on a uniform time grid, so every statistic is weighted by time and not by logging rate
+        self.times = times
+        self.errors = errors
+        distances = np.hypot(errors[0], errors[1])
+        self.samples = len(times)
+        self.mean_dx, self.mean_dy = float(np.mean(errors[0])), float(np.mean(errors[1]))
+        self.mean = float(np.mean(distances))
+        self.median = float(np.median(distances))
+        self.rms = float(np.sqrt(np.mean(distances ** 2)))
+        self.p95 = float(np.percentile(distances, 95))
+        self.max = float(np.max(distances))
+        self.final = float(distances[-1])
+        # slope of a least squares line through error over time, in inches per second
+        self.drift_rate = float(np.polyfit(times, distances, 1)[0]) if self.samples > 1 and np.ptp(times) > 0 else 0.0
+
+    def as_dict(self):
+        return {"team_key": self.team_key, "station": self.station, "offset": self.offset, "samples": self.samples,
+                "mean_dx": self.mean_dx, "mean_dy": self.mean_dy, "mean": self.mean, "median": self.median,
+                "rms": self.rms, "p95": self.p95, "max": self.max, "final": self.final, "drift_rate": self.drift_rate}
+
+    def __str__(self):
+        if self.station != None:
+            team = "%s (driver station %d, assuming TBA lists teams in station order)" % (self.team_key, self.station)
+        else:
+            team = self.team_key
+        return ("Team: %s\nTime offset: %.2f s\nSamples: %d\nMean bias: (%.1f, %.1f) in\nMean error: %.1f in\n"
+                "Median error: %.1f in\nRMS error: %.1f in\n95th percentile: %.1f in\nMax error: %.1f in\n"
+                "Final error: %.1f in\nDrift rate: %.2f in/s") % \
+            (team, self.offset, self.samples, self.mean_dx, self.mean_dy, self.mean, self.median,
+             self.rms, self.p95, self.max, self.final, self.drift_rate)
+
+def log_track(log_info, alliance):
+    # robot poses in field coordinates (inches, bottom left corner as origin), same frame as the ZMW track
+    times = np.array([log.time for log in log_info], dtype=np.float64)
+    positions = np.array([util.align_with_origin(log.actual_pos.pos, alliance) for log in log_info], dtype=np.float64).T
+    # the log can have several poses with the same timestamp, np.interp needs them strictly increasing
+    times, first = np.unique(times, return_index=True)
+    return times, positions[:, first]
+
+def resample(times, values, new_times, max_gap=None):
+    """
+    Linearly interpolates each row of values onto new_times, skipping NaN samples.
+
+    Points outside the sampled range are NaN, and so are points whose nearest valid sample of that row is more
+    than max_gap away, so long holes in the data are not filled in with made up values.
+    """
+    values = np.atleast_2d(values)
+    new_times = np.asarray(new_times)
+    resampled = np.full((values.shape[0],) + new_times.shape, np.nan)
+    for i, row in enumerate(values):
+        valid = np.isfinite(row)
+        if np.count_nonzero(valid) < 2:
+            continue
+        valid_times = times[valid]
+        resampled[i] = np.interp(new_times, valid_times, row[valid], left=np.nan, right=np.nan)
+        if max_gap != None:
+            after = np.clip(np.searchsorted(valid_times, new_times), 1, len(valid_times) - 1)
+            nearest = np.minimum(np.abs(new_times - valid_times[after - 1]), np.abs(valid_times[after] - new_times))
+            resampled[i][nearest > max_gap] = np.nan
+    return resampled
+
+def max_gap(times):
+    # about one sample period, with a little slack so a single dropped sample is still bridged despite rounding
+    return 1.01 * float(np.median(np.diff(times)))
+
+def time_grid(robot_times, dt):
+    return np.arange(robot_times[0], robot_times[-1] + dt / 2, dt)
+
+def estimate_time_offset(robot_times, robot_pos, zmw_times, zmw_pos, dt=0.1, max_offset=3.0, min_overlap=0.5):
+    """
+    Estimates the offset to add to robot log times to line them up with the Zebra MotionWorks times.
+
+    Both tracks are resampled onto a common time base with spacing dt and the velocities are cross-correlated
+    for every lag up to max_offset. Velocities are used instead of positions so a constant localization error
+    does not bias the result. Lags where less than min_overlap of the robot samples overlap the track are ignored.
+    """
+    grid = time_grid(robot_times, dt)
+    if len(grid) < 3:
+        raise AlignmentError("robot log is too short to align")
+    robot_vel = np.gradient(resample(robot_times, robot_pos, grid), dt, axis=1)
+    valid = np.isfinite(zmw_pos).all(axis=0)
+    if np.count_nonzero(valid) < 3:
+        raise AlignmentError("not enough Zebra MotionWorks samples")
+    zmw_vel = np.gradient(zmw_pos[:, valid], zmw_times[valid], axis=1)
+
+    lags = np.arange(-round(max_offset / dt), round(max_offset / dt) + 1) * dt
+    # (lags, samples) grid of shifted times, every lag is interpolated at once
+    shifted = resample(zmw_times[valid], zmw_vel, grid[None, :] + lags[:, None], max_gap(zmw_times))
+    overlap = np.isfinite(shifted).all(axis=0) & np.isfinite(robot_vel).all(axis=0)
+    r = np.where(overlap, robot_vel[:, None, :], 0.0)
+    z = np.where(overlap, shifted, 0.0)
+    numerator = np.sum(r * z, axis=(0, 2))
+    denominator = np.sqrt(np.sum(r ** 2, axis=(0, 2)) * np.sum(z ** 2, axis=(0, 2)))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        score = np.where(denominator > 0, numerator / denominator, -np.inf)
+    score[np.count_nonzero(overlap, axis=1) < min_overlap * len(grid)] = -np.inf
+    if not np.isfinite(score).any():
+        raise AlignmentError("could not estimate the time offset, the robot never moved or the tracks barely overlap")
+    return float(lags[np.argmax(score)])
+
+def compute_drift(log_info, alliance, zmw, team_key, dt=0.1, max_offset=3.0, station=None):
+    color = alliance_color(alliance)
+    if color == None:
+        raise AlignmentError("unknown alliance %s" % alliance)
+    if team_key not in zmw.tracks[color]:
+        raise AlignmentError("%s is not on the %s alliance" % (team_key, color))
+    robot_times, robot_pos = log_track(log_info, alliance)
+    zmw_pos = zmw.tracks[color][team_key] * ZMW_SCALE
+    offset = estimate_time_offset(robot_times, robot_pos, zmw.times, zmw_pos, dt, max_offset)
+    grid = time_grid(robot_times, dt)
+    truth = resample(zmw.times, zmw_pos, grid + offset, max_gap(zmw.times))
+    errors = resample(robot_times, robot_pos, grid) - truth
+    valid = np.isfinite(errors).all(axis=0)
+    if not valid.any():
+        raise AlignmentError("robot log does not overlap the Zebra MotionWorks track")
+    return DriftStats(team_key, offset, grid[valid], errors[:, valid], station)
+
+def robot_station(lines):
+    fms_info = parse_fms_info(lines)
+    if fms_info == None:
+        raise AlignmentError("could not find the driver station in the log")
+    return fms_info["station"]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare a robot log against Zebra MotionWorks tracking data.")
+    parser.add_argument("log", help="trace log file")
+    parser.add_argument("--team", help="TBA team key (e.g. frc492), taken from the driver station in the log by default")
+    parser.add_argument("--output", help="JSON file to write the drift statistics to")
+    parser.add_argument("--max-offset", type=float, default=3.0, help="largest time offset to search, in seconds")
+    args = parser.parse_args()
+    try:
+        with open(args.log) as fp:
+            match_info, auto_choices, log_info, lines, _ = parse_file(fp)
+        if "@alliance" not in auto_choices:
+            raise ParseError("no alliance in the auto choices")
+        alliance = auto_choices["@alliance"]
+        try:
+            zmw = ZebraMotionWorks.from_match_info(match_info, lines)
+        except (json.decoder.JSONDecodeError, KeyError, TypeError):
+            raise ZMWError("invalid Zebra MotionWorks data")
+        if args.team:
+            team_key, station = args.team, None
+        else:
+            station = robot_station(lines)
+            team_key = zmw.team_at_station(alliance, station)
+            print("Using %s from driver station %d, pass --team if that is not the right robot" % (team_key, station),
+                  file=sys.stderr)
+        stats = compute_drift(log_info, alliance, zmw, team_key, max_offset=args.max_offset, station=station)
+        print(stats)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(stats.as_dict(), f, indent=4)
+    except (ParseError, ZMWError, AlignmentError) as e:
+        print("%s: %s" % (args.log, e.message), file=sys.stderr)
+        sys.exit(1)
+    except OSError as e:
+        print("%s: %s" % (e.filename or args.log, e.strerror or e), file=sys.stderr)
+        sys.exit(1)
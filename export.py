@@ -0,0 +1,230 @@
+import os
+import sys
+import argparse
+import numpy as np
+from util import ParseError, parse_file
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+FORMATS = {"npz": ".npz", "parquet": ".parquet", "arrow": ".arrow"}
+
+# columns every export has, the auto choices add more depending on the game
+TIMELINE_COLUMNS = {"time": np.float64, "x": np.float64, "y": np.float64, "heading": np.float64,
+                    "x_target": np.float64, "y_target": np.float64, "heading_target": np.float64, "state": str,
+                    "log_index": np.int64, "log_file": str, "date": str, "match_type": str, "match_number": np.int64,
+                    "alliance": str}
+
+class ExportError(Exception):
+    def __init__(self, message):
+        self.message = message
+
+def timeline_columns(match_info, auto_choices, pos_info, log_file=""):
+    # one row per position entry, with the match metadata repeated on every row so files can be filtered per column
+    n = len(pos_info)
+    nan = float("nan")
+    columns = {
+        "time": np.array([log.time for log in pos_info], dtype=np.float64),
+        "x": np.array([log.actual_pos.x for log in pos_info], dtype=np.float64),
+        "y": np.array([log.actual_pos.y for log in pos_info], dtype=np.float64),
+        "heading": np.array([log.actual_pos.heading for log in pos_info], dtype=np.float64),
+        # the target is unknown until the first StateInfo event, so those rows get NaN
+        "x_target": np.array([log.abs_target.x if log.abs_target else nan for log in pos_info], dtype=np.float64),
+        "y_target": np.array([log.abs_target.y if log.abs_target else nan for log in pos_info], dtype=np.float64),
+        "heading_target": np.array([log.abs_target.heading if log.abs_target else nan for log in pos_info], dtype=np.float64),
+        "state": np.array([log.state_name for log in pos_info], dtype=str),
+        "log_index": np.array([log.log_index for log in pos_info], dtype=np.int64),
+        "log_file": np.full(n, os.path.basename(log_file)),
+        "date": np.full(n, str(match_info.get("@date", ""))),
+        "match_type": np.full(n, str(match_info.get("@type", ""))),
+    }
+    try:
+        columns["match_number"] = np.full(n, int(match_info.get("@number", -1)), dtype=np.int64)
+    except ValueError:
+        columns["match_number"] = np.full(n, -1, dtype=np.int64)
+    for key, val in auto_choices.items():
+        # "@alliance" -> "alliance", "@strategy" -> "auto_strategy", etc.
+        if key == "@name":
+            continue
+        if key == "@alliance":
+            # FTC logs say "RED_ALLIANCE", FRC logs say "Red"
+            val = "Blue" if "blue" in val.lower() else "Red" if "red" in val.lower() else val
+            columns["alliance"] = np.full(n, val)
+        else:
+            columns["auto_" + key[1:]] = np.full(n, str(val))
+    return columns
+
+def write_columns(columns, path, fmt="npz"):
+    if fmt not in FORMATS:
+        raise ExportError("unknown export format %s" % fmt)
+    if fmt == "npz":
+        np.savez_compressed(path, **columns)
+        return
+    if pa is None:
+        raise ExportError("pyarrow must be installed to export to %s" % fmt)
+    try:
+        table = pa.table({name: pa.array(col) for name, col in columns.items()})
+        if fmt == "parquet":
+            pq.write_table(table, path)
+        else:
+            with pa.OSFile(path, "wb") as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+    except pa.ArrowException as e:
+        raise ExportError(str(e))
+
+def export_timeline(match_info, auto_choices, pos_info, path, fmt="npz", log_file=""):
+    write_columns(timeline_columns(match_info, auto_choices, pos_info, log_file), path, fmt)
+
+def export_log(log_path, out_dir, fmt="npz"):
+    if fmt not in FORMATS:
+        raise ExportError("unknown export format %s" % fmt)
+    with open(log_path) as fp:
+        match_info, auto_choices, pos_info, _, _ = parse_file(fp)
+    out_path = os.path.join(out_dir, os.path.splitext(os.path.basename(log_path))[0] + FORMATS[fmt])
+    export_timeline(match_info, auto_choices, pos_info, out_path, fmt, log_path)
+    return out_path
+
+def cast_predicate(name, value, cast):
+    # predicate values are converted to the column type so e.g. match_number="52" works the same for every format
+    try:
+        if isinstance(value, (list, tuple, set)):
+            return [cast(v) for v in value]
+        return cast(value)
+    except (TypeError, ValueError):
+        raise ExportError("cannot compare column %s to %r" % (name, value))
+
+def whole_number(value):
+    # int() would quietly truncate 52.7 to 52 and turn True into 1
+    if isinstance(value, bool):
+        raise ValueError("not a whole number")
+    if isinstance(value, str):
+        return int(value)
+    if not float(value).is_integer():
+        raise ValueError("not a whole number")
+    return int(value)
+
+def predicate_mask(column, value):
+    # a list means "any of these", anything else means equality
+    if isinstance(value, list):
+        return np.isin(column, value)
+    return column == value
+
+def _numpy_cast(dtype):
+    if np.issubdtype(dtype, np.integer):
+        return whole_number
+    if np.issubdtype(dtype, np.floating):
+        return float
+    return str
+
+def _arrow_cast(arrow_type):
+    if pa.types.is_integer(arrow_type):
+        return whole_number
+    if pa.types.is_floating(arrow_type):
+        return float
+    return str
+
+def _query_npz(path, columns, predicates):
+    with np.load(path) as data:
+        # npz members are loaded lazily, so only the predicate columns are read until a file is known to match
+        mask = None
+        for name, value in predicates.items():
+            if name not in data.files:
+                return None
+            column = data[name]
+            m = predicate_mask(column, cast_predicate(name, value, _numpy_cast(column.dtype)))
+            mask = m if mask is None else mask & m
+        if mask is not None and not mask.any():
+            return None
+        names = data.files if columns is None else columns
+        result = {}
+        for name in names:
+            if name in data.files:
+                col = data[name]
+                result[name] = col if mask is None else col[mask]
+        return result
+
+def _query_arrow(path, columns, predicates):
+    if pa is None:
+        raise ExportError("pyarrow must be installed to query %s" % path)
+    if path.endswith(".parquet"):
+        schema = pq.read_schema(path)
+    else:
+        with pa.memory_map(path) as source:
+            schema = pa.ipc.open_file(source).schema
+    if any(name not in schema.names for name in predicates.keys()):
+        return None
+    filters = []
+    for name, value in predicates.items():
+        value = cast_predicate(name, value, _arrow_cast(schema.field(name).type))
+        filters.append((name, "in", value) if isinstance(value, list) else (name, "==", value))
+    names = None if columns is None else [name for name in columns if name in schema.names]
+    try:
+        if path.endswith(".parquet"):
+            # parquet row groups are skipped using their statistics when the filters rule them out
+            table = pq.read_table(path, columns=names, filters=filters or None)
+        else:
+            import pyarrow.dataset as ds
+            table = ds.dataset(path, format="arrow").to_table(columns=names, filter=pq.filters_to_expression(filters) if filters else None)
+    except pa.ArrowException as e:
+        raise ExportError("%s: %s" % (path, e))
+    if table.num_rows == 0:
+        return None
+    return {name: table.column(name).to_numpy(zero_copy_only=False) for name in table.column_names}
+
+def query(directory, columns=None, **predicates):
+    """
+    Scans every exported timeline in a directory and returns the matching rows as a dict of numpy columns.
+
+    Predicates are given as keyword arguments, e.g. query("exports", state="MOVE_TO_SHOOT", alliance="Red",
+    match_type="Qualification"). A list, tuple or set matches any of its values. Files that do not have a
+    predicate column are skipped, and requested columns missing from a file are filled with empty strings.
+    Predicate values are converted to the type of their column, and ExportError is raised if that fails.
+    When nothing matches, the requested columns (or the standard timeline columns) are returned empty.
+    """
+    parts = []
+    for fname in sorted(os.listdir(directory)):
+        path = os.path.join(directory, fname)
+        ext = os.path.splitext(fname)[1]
+        if ext == ".npz":
+            part = _query_npz(path, columns, predicates)
+        elif ext in (".parquet", ".arrow"):
+            part = _query_arrow(path, columns, predicates)
+        else:
+            continue
+        if part:
+            parts.append(part)
+    if not parts:
+        names = TIMELINE_COLUMNS.keys() if columns is None else columns
+        return {name: np.array([], dtype=TIMELINE_COLUMNS.get(name, str)) for name in names}
+    names = list(columns) if columns is not None else []
+    for part in parts:
+        names.extend(name for name in part.keys() if name not in names)
+    result = {}
+    for name in names:
+        result[name] = np.concatenate([part[name] if name in part else np.full(len(next(iter(part.values()))), "", dtype=str)
+                                       for part in parts])
+    return result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export parsed trace log timelines to columnar files.")
+    parser.add_argument("out_dir", help="directory to write the exported files to")
+    parser.add_argument("logs", nargs="+", help="trace log files to export")
+    parser.add_argument("--format", choices=FORMATS.keys(), default="npz")
+    args = parser.parse_args()
+    os.makedirs(args.out_dir, exist_ok=True)
+    failed = False
+    for log_path in args.logs:
+        try:
+            print(export_log(log_path, args.out_dir, args.format))
+        except (ParseError, ExportError) as e:
+            print("%s: %s" % (log_path, e.message), file=sys.stderr)
+            failed = True
+        except OSError as e:
+            print("%s: %s" % (log_path, e), file=sys.stderr)
+            failed = True
+    sys.exit(1 if failed else 0)
@@ -7,6 +7,8 @@ import os
 import platform
 import numpy as np
 from zebra_motionworks import ZebraMotionWorks, ZMWError
+from export import FORMATS, ExportError, export_timeline
+from alignment import AlignmentError, compute_drift, robot_station
 import util
 from util import Stopwatch, ParseError, rotate_vector, parse_file, align_with_origin, flip_y, v3_align_with_origin
 
@@ -65,6 +67,18 @@ class AutoChoicesWindow(InfoWindow):
         else:
             return ""
 
+class DriftWindow(InfoWindow):
+    def __init__(self, analysis_window):
+        super().__init__(analysis_window, "Localization Drift")
+
+    def get_info_text(self):
+        if self.parent.drift:
+            return str(self.parent.drift)
+        elif self.parent.zmw:
+            return "Could not line up the log with the Zebra MotionWorks data."
+        else:
+            return "No Zebra MotionWorks data loaded."
+
 class RawLogWindow(InfoWindow):
     def __init__(self, parent_window, lines, colors, on_change):
         self.parent = parent_window
@@ -113,6 +127,7 @@ class AnalysisWindow:
         self.screen_dimensions = screen_dimensions
         self.field_dimensions = field_dimensions
         self.log_name = None
+        self.log_path = None
         self.log_info = None
         self.alliance = None
         self.match_info = None
@@ -121,6 +136,7 @@ class AnalysisWindow:
         self.lines = []
         self.line_colors = []
         self.zmw = None
+        self.drift = None
 
         self.kill = False
         
@@ -139,18 +155,21 @@ class AnalysisWindow:
 
         self.match_info_window = MatchInfoWindow(self)
         self.auto_choices_window = AutoChoicesWindow(self)
+        self.drift_window = DriftWindow(self)
         self.log_window = RawLogWindow(self, self.lines, self.line_colors, self.set_step_from_line)
 
         self.root.protocol("WM_DELETE_WINDOW", self.prompt_close)
 
         menu_bar = tk.Menu(self.root)
         menu_bar.add_command(label="Open", command=self.prompt_file)
+        menu_bar.add_command(label="Export", command=self.prompt_export)
         menu_bar.add_command(label="Close", command=self.prompt_close)
         info_menu = tk.Menu(menu_bar, tearoff=0)
         info_menu.add_command(label="Match Info", command=self.match_info_window.reopen)
         info_menu.add_command(label="Auto Choices", command=self.auto_choices_window.reopen)
         info_menu.add_command(label="Raw Log XML", command=self.log_window.reopen)
         info_menu.add_command(label="Zebra MotionWorks", command=self.get_zebra_motionworks)
+        info_menu.add_command(label="Localization Drift", command=self.drift_window.reopen)
 
         embed = tk.Frame(self.root, width=self.screen_dimensions[0], height=self.screen_dimensions[1])
         embed.pack(side=tk.TOP)
@@ -214,6 +233,28 @@ class AnalysisWindow:
             self.reload(f)
             # parse_file handles file closing so we don't have to do that here
 
+    def prompt_export(self):
+        if self.log_info == None:
+            messagebox.showerror("Error", "No log file loaded, nothing to export.")
+            return
+        path = filedialog.asksaveasfilename(parent=self.root, title="Export timeline", defaultextension=".npz",
+                                            filetypes=(("NumPy archive", "*.npz"), ("Parquet", "*.parquet"), ("Arrow", "*.arrow")))
+        if not path:
+            return
+        fmt = os.path.splitext(path)[1][1:].lower()
+        if fmt not in FORMATS:
+            messagebox.showerror("Error", "Unknown export format \"%s\", use .npz, .parquet or .arrow." % os.path.splitext(path)[1])
+            return
+        try:
+            export_timeline(self.match_info, self.auto_choices, self.log_info, path, fmt, self.log_path or "")
+        except ExportError as e:
+            messagebox.showerror("Error", "Something went wrong exporting the timeline: %s" % e.message)
+            return
+        except OSError as e:
+            messagebox.showerror("Error", "Something went wrong exporting the timeline: %s" % e)
+            return
+        messagebox.showinfo("Success", "Timeline exported to %s." % path)
+
     def reload(self, log_file):
         try:
             self.match_info, self.auto_choices, self.log_info, self.lines, self.line_colors = parse_file(log_file)
@@ -221,6 +262,7 @@ class AnalysisWindow:
             messagebox.showerror("Error", "Something went wrong parsing the file: %s. Make sure the file is a valid autonomous log." % e.message)
             return
         self.alliance = self.auto_choices["@alliance"]
+        self.log_path = getattr(log_file, "name", None)
         self.log_name = "%s %s" % (self.match_info["@type"], self.match_info["@number"])
         self.stopwatch.max_time = self.log_info[-1].time
         self.stopwatch.stop()
@@ -229,6 +271,7 @@ class AnalysisWindow:
         self.time_slider.configure(to=self.log_info[-1].time)
         self.log_window.reset(self.lines, self.line_colors)
         self.zmw = None
+        self.drift = None
 
     def slider_update(self, num):
         if self.set_update:
@@ -324,35 +367,45 @@ class AnalysisWindow:
         self.set_step(s)
 
     def get_zebra_motionworks(self):
-        # TODO: make this more flexible
         if self.match_info == None:
             messagebox.showerror("Error", "No log file loaded, cannot retrieve Zebra MotionWorks data.")
             return
         failed_error = "Something went wrong downloading Zebra MotionWorks data from TheBlueAlliance: "
         try:
-            # for now the year and event identifier are hardcoded, will soon add parsing thing
-            self.zmw = ZebraMotionWorks(2020, "wasno", self.match_info["@type"], self.match_info["@number"])
+            self.zmw = ZebraMotionWorks.from_match_info(self.match_info, self.lines)
         except ZMWError as e:
             messagebox.showerror("Error", failed_error + e.message)
             return
         except json.decoder.JSONDecodeError:
             messagebox.showerror("Error", failed_error + "invalid JSON data")
             return
-        except KeyError:
+        except (KeyError, TypeError):
             messagebox.showerror("Error", failed_error + "missing JSON content")
             return
+        try:
+            station = robot_station(self.lines)
+            team_key = self.zmw.team_at_station(self.alliance, station)
+            self.drift = compute_drift(self.log_info, self.alliance, self.zmw, team_key, station=station)
+        except (AlignmentError, ZMWError) as e:
+            self.drift = None
+            messagebox.showwarning("Warning", "Zebra MotionWorks data was retrieved, but the log could not be lined up with it: %s" % e.message)
+            return
         messagebox.showinfo("Success", "Zebra MotionWorks data successfully retrieved.")
 
     def display_zebra_motionworks(self):
         data = self.zmw.data
-        index = self.zmw.closest_time_index(self.stopwatch.get_time())
+        offset = self.drift.offset if self.drift else 0.0
+        index = self.zmw.closest_time_index(self.stopwatch.get_time() + offset)
         robots = []
         for alliance, teams in data.items():
             robots.extend([(alliance, team, coords_list[index]) for team, coords_list in teams.items()])
         for robot in robots:
             color = (255, 0, 0) if robot[0] == "red" else (0, 0, 255)
             try:
-                pygame.draw.circle(self.screen, color, self.inches_to_pixels(flip_y([(coord * 12) for coord in robot[2]])), 7)
+                pos = self.inches_to_pixels(flip_y([(coord * 12) for coord in robot[2]]))
+                pygame.draw.circle(self.screen, color, pos, 7)
+                if self.drift and robot[1] == self.drift.team_key:
+                    pygame.draw.circle(self.screen, (255, 255, 255), pos, 10, 2)
             except TypeError:
                 pass
 
@@ -372,6 +425,8 @@ class AnalysisWindow:
                     self.match_info_window.update()
                 if self.auto_choices_window.open:
                     self.auto_choices_window.update()
+                if self.drift_window.open:
+                    self.drift_window.update()
                 if self.log_window.open:
                     self.log_window.update()
                 if self.zmw:
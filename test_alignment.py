@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+import alignment
+from alignment import AlignmentError
+from util import parse_file
+
+class FakeZebraMotionWorks:
+    def __init__(self, times, tracks):
+        self.times = times
+        self.tracks = tracks
+
+@pytest.fixture(scope="module")
+def frc_log():
+    with open("example_frc_log.log") as fp:
+        match_info, auto_choices, log_info, lines, _ = parse_file(fp)
+    return log_info, auto_choices["@alliance"]
+
+def shifted_track(log_info, alliance, offset, bias):
+    # ground truth that runs offset seconds behind the robot log, bias inches away from the robot's own pose
+    times = np.arange(0.0, 150.0, 0.1)
+    robot_times, robot_pos = alignment.log_track(log_info, alliance)
+    track = (alignment.resample(robot_times, robot_pos, times - offset) + np.array(bias)[:, None]) / alignment.ZMW_SCALE
+    return times, track
+
+def test_recovers_known_offset(frc_log):
+    log_info, alliance = frc_log
+    times, track = shifted_track(log_info, alliance, 1.3, (6.0, -3.0))
+    zmw = FakeZebraMotionWorks(times, {"red": {"frc492": track}, "blue": {}})
+    stats = alignment.compute_drift(log_info, alliance, zmw, "frc492")
+    assert stats.offset == pytest.approx(1.3)
+    assert stats.mean_dx == pytest.approx(-6.0, abs=1.0)
+    assert stats.mean_dy == pytest.approx(3.0, abs=1.0)
+
+def test_accepts_other_alliance_spellings(frc_log):
+    log_info, alliance = frc_log
+    times, track = shifted_track(log_info, alliance, 0.5, (0.0, 0.0))
+    zmw = FakeZebraMotionWorks(times, {"red": {"frc492": track}, "blue": {}})
+    assert alignment.compute_drift(log_info, "RED_ALLIANCE", zmw, "frc492").offset == pytest.approx(0.5)
+    with pytest.raises(AlignmentError):
+        alignment.compute_drift(log_info, "Green", zmw, "frc492")
+
+def test_resample_does_not_fill_long_gaps():
+    times = np.arange(0.0, 2.0, 0.1)
+    values = times.copy()
+    values[5] = np.nan
+    values[10:15] = np.nan
+    resampled = alignment.resample(times, values, times, max_gap=alignment.max_gap(times))[0]
+    # a single missing sample is bridged, a half second hole is not
+    assert resampled[5] == pytest.approx(0.5)
+    assert np.isnan(resampled[12])
+
+def test_stationary_robot_has_no_offset():
+    times = np.arange(0.0, 5.0, 0.1)
+    pos = np.zeros((2, len(times)))
+    with pytest.raises(AlignmentError):
+        alignment.estimate_time_offset(times, pos, times, pos)
@@ -2,6 +2,7 @@ import time
 import math
 import os
 import json
+import re
 import traceback
 import numpy as np
 from tkinter import messagebox
@@ -157,6 +158,14 @@ def str_get_vars(string, *var_names):
         parsed_vars.append(var)
     return parsed_vars
 
+def alliance_color(alliance):
+    # "Red", "RED_ALLIANCE", "Red Alliance", etc. -> "red"; None if it's neither color
+    if "blue" in alliance.lower():
+        return "blue"
+    elif "red" in alliance.lower():
+        return "red"
+    return None
+
 def align_with_origin(point, alliance):
     x_direction = BLUE_X_DIRECTION if "blue" in alliance.lower() else RED_X_DIRECTION
     origin = BLUE_ORIGIN if "blue" in alliance.lower() else RED_ORIGIN
@@ -188,6 +197,15 @@ def rotate_vector(v, angle, degrees=False):
     rotated = np.matmul(np.array(v), rot_matrix)
     return tuple(rotated)
 
+def parse_fms_info(lines):
+    # the FMS match name is only printed by startMode, e.g. "WASNO_Qualification052 (Red1)"
+    for line in lines:
+        match = re.search(r"([A-Za-z0-9]+)_([A-Za-z]+)(\d+) \((Red|Blue)(\d)\)", line)
+        if match:
+            return {"event": match.group(1).lower(), "type": match.group(2), "number": int(match.group(3)),
+                    "alliance": match.group(4), "station": int(match.group(5))}
+    return None
+
 def parse_file(fp):
     try:
         lines = fp.readlines()
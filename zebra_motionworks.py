@@ -1,6 +1,8 @@
 from bs4 import BeautifulSoup
 import json
 import requests
+import numpy as np
+from util import parse_fms_info, alliance_color
 
 class ZMWError(Exception):
     def __init__(self, message):
@@ -9,12 +11,36 @@ class ZMWError(Exception):
 class ZebraMotionWorks:
 
     def __init__(self, year, event_spec, match_type, match_number):
-        if match_type == "Qualification":
-            match_spec = "qm"
-        # TODO: add other options
-        self.url = (f"https://www.thebluealliance.com/match/{year}{event_spec}_{match_spec}{match_number}")
+        # the log only has a plain match number, which can't be turned into TBA's elimination "<set>m<match>" keys
+        if match_type.lower() != "qualification":
+            raise ZMWError("Zebra MotionWorks data can only be retrieved for Qualification matches")
+        match_spec = "qm"
+        try:
+            match_number = int(match_number)
+        except (TypeError, ValueError):
+            raise ZMWError("invalid match number %s" % match_number)
+        self.url = (f"https://www.thebluealliance.com/match/{year}{event_spec.lower()}_{match_spec}{match_number}")
         self.get_motionworks_data()
 
+    @classmethod
+    def from_match_info(cls, match_info, lines=()):
+        if "@type" not in match_info or "@number" not in match_info:
+            raise ZMWError("match info is missing the match type or number")
+        if match_info["@type"].lower() != "qualification":
+            raise ZMWError("Zebra MotionWorks data can only be retrieved for Qualification matches")
+        # the date ends with the year, e.g. "Sat Feb 29 19:04:03 PST 2020"
+        try:
+            year = int(match_info["@date"].split()[-1])
+        except (KeyError, IndexError, ValueError):
+            raise ZMWError("could not get the year from the match info")
+        event_spec = match_info.get("@event")
+        if event_spec == None:
+            fms_info = parse_fms_info(lines)
+            if fms_info == None:
+                raise ZMWError("could not find the event code in the log")
+            event_spec = fms_info["event"]
+        return cls(year, event_spec, match_info["@type"], match_info["@number"])
+
     def get_motionworks_data(self):
         try:
             with requests.get(self.url) as response:
@@ -25,24 +51,38 @@ class ZebraMotionWorks:
             raise ZMWError("could not connect to TheBlueAlliance.")
         soup = BeautifulSoup(content, "html.parser")
 
-        raw_data = soup.find("div", {"class": "zebramotionworks-content"})["data-zebramotionworks"]
-        data = json.loads(raw_data)
+        # most match pages have no tracking data at all
+        div = soup.find("div", {"class": "zebramotionworks-content"})
+        if div == None or not div.has_attr("data-zebramotionworks"):
+            raise ZMWError("no Zebra MotionWorks data for this match")
+        data = json.loads(div["data-zebramotionworks"])
 
         alliances = {"blue": {}, "red": {}}
+        tracks = {"blue": {}, "red": {}}
 
         for alliance_name in ["red", "blue"]:
             for team in data["alliances"][alliance_name]:
                 alliances[alliance_name][team["team_key"]] = list(zip(team["xs"], team["ys"]))
+                # missing samples come through as None, which become NaN here
+                tracks[alliance_name][team["team_key"]] = np.array([team["xs"], team["ys"]], dtype=np.float64)
         
         self.data = alliances
-        self.times = data["times"]
+        self.tracks = tracks
+        self.times = np.array(data["times"], dtype=np.float64)
 
     def closest_time_index(self, t_p):
         # not really closest but whatever
-        for i, t in enumerate(self.times):
-            if t >= t_p:
-                return i
-        return len(self.times) - 1
+        return min(int(np.searchsorted(self.times, t_p)), len(self.times) - 1)
+
+    def team_at_station(self, alliance, station):
+        # assumes TBA lists the teams of an alliance in driver station order, nothing in the data confirms it
+        color = alliance_color(alliance)
+        if color == None:
+            raise ZMWError("unknown alliance %s" % alliance)
+        teams = list(self.data[color].keys())
+        if not 1 <= station <= len(teams):
+            raise ZMWError("no team at %s%d" % (alliance, station))
+        return teams[station - 1]
 
 if __name__ == "__main__":
     zmw = ZebraMotionWorks(2020, "wasno", "Qualification", 20)